@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import argparse
+import logging
+import tempfile
+import subprocess
+import httpx
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from app.utils.collection_manager import release_chroma
+from app.utils.document_processor import load_and_split_files
+from app.utils.offline_embeddings import HashingEmbeddings
+from app.utils.sharded_retrieval import ShardClient, build_shards
+from app.config import DATA_FOLDER, CHUNK_SPLITTER, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_RETRIEVAL_K
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GOLDEN_SET_PATH = os.path.join(os.path.dirname(__file__), "evaluation", "golden_questions.json")
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_shard_server(shards_dir, workers_per_shard):
+    """Run the shard server in its own process, as in production, and wait until it answers."""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.shard_server",
+            "--shards-dir", shards_dir,
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--workers-per-shard", str(workers_per_shard)
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Shard server exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Shard server did not start in time")
+
+
+def load_corpus(replicate):
+    """Load the chunks, repeating them to emulate a larger corpus."""
+    logging.getLogger("app.utils.document_processor").setLevel(logging.WARNING)
+    chunks, metadatas = load_and_split_files(
+        DATA_FOLDER,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        splitter=CHUNK_SPLITTER
+    )
+    all_chunks, all_metadatas = [], []
+    for copy in range(replicate):
+        all_chunks.extend(chunks)
+        all_metadatas.extend([{**m, "copy": copy} for m in metadatas])
+    return all_chunks, all_metadatas
+
+
+async def drive(search, questions, k, concurrency, requests):
+    """Issue requests with a fixed number in flight and record each latency."""
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(questions[i % len(questions)])
+
+    async def worker():
+        while not queue.empty():
+            question = queue.get_nowait()
+            start = time.perf_counter()
+            await search(question, k=k)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def measure(label, search, questions, args):
+    # Warm up caches and worker processes before timing
+    await drive(search, questions, args.k, args.concurrency, min(len(questions), args.requests))
+    latencies, elapsed = await drive(search, questions, args.k, args.concurrency, args.requests)
+    ms = np.array(latencies) * 1000
+    return {
+        "setup": label,
+        "throughput_qps": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(ms, 50)),
+        "latency_p95_ms": float(np.percentile(ms, 95)),
+        "latency_p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+async def measure_shard_server(label, url, embeddings, questions, args):
+    # The client's connection pool belongs to the event loop it is used on
+    client = ShardClient(url, embeddings)
+    try:
+        return await measure(label, client.asimilarity_search, questions, args)
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scatter-gather retrieval throughput and latency by shard count")
+    parser.add_argument("--shards", type=parse_int_list, default=[1, 2, 4, 8])
+    parser.add_argument("--strategy", choices=["domain", "hash"], default="hash")
+    parser.add_argument("--workers-per-shard", type=int, default=1)
+    parser.add_argument("--replicate", type=int, default=10, help="Copies of the corpus, to emulate a larger index")
+    parser.add_argument("--k", type=int, default=CHUNK_RETRIEVAL_K)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="Optional path to write results as JSON")
+    args = parser.parse_args()
+
+    chunks, metadatas = load_corpus(args.replicate)
+    embeddings = HashingEmbeddings()
+    with open(GOLDEN_SET_PATH, encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+    logger.info(f"Benchmarking over {len(chunks)} chunks, k={args.k}, concurrency={args.concurrency}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # Both setups are searched through asimilarity_search, the call ChatProcessor.get_answer
+        # makes, so query embedding and event loop hand-offs are included as in production
+        store = Chroma.from_texts(chunks, embeddings, metadatas=metadatas, persist_directory=f"{workdir}/in-process")
+        rows.append(asyncio.run(measure("in-process", store.asimilarity_search, questions, args)))
+        release_chroma(store)
+
+        for shard_count in args.shards:
+            shards_dir = f"{workdir}/shards-{shard_count}"
+            paths = build_shards(chunks, metadatas, embeddings, shard_count, args.strategy, shards_dir)
+            # Searched the way API workers do: through a ShardClient connected to the shard server
+            process, url = start_shard_server(shards_dir, args.workers_per_shard)
+            try:
+                rows.append(asyncio.run(measure_shard_server(
+                    f"{len(paths)} shards x {args.workers_per_shard}",
+                    url,
+                    embeddings,
+                    questions,
+                    args
+                )))
+            finally:
+                process.terminate()
+                process.wait()
+
+    header = f"{'setup':>16} {'qps':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['setup']:>16} {r['throughput_qps']:>8.1f} {r['latency_p50_ms']:>8.2f} "
+            f"{r['latency_p95_ms']:>8.2f} {r['latency_p99_ms']:>8.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        logger.info(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import argparse
+import logging
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from app.utils.document_processor import load_and_split_files
+from app.utils.embedding_store import CachedEmbeddings, EmbeddingStore
+from app.utils.sharded_retrieval import build_shards
+from app.config import (
+    GOOGLE_API_KEY,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_PATH,
+    COLLECTIONS,
+    DEFAULT_COLLECTION,
+    SHARDS_DIR,
+    SHARD_COUNT,
+    SHARD_STRATEGY,
+    CHUNK_SPLITTER,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition a collection into shards for sharded retrieval")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT)
+    parser.add_argument("--strategy", choices=["domain", "hash"], default=SHARD_STRATEGY)
+    args = parser.parse_args()
+
+    if args.collection not in COLLECTIONS:
+        raise SystemExit(f"Unknown collection '{args.collection}'. Add it to COLLECTIONS in config.py first.")
+
+    chunks, metadatas = load_and_split_files(
+        COLLECTIONS[args.collection]["data_folder"],
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        splitter=CHUNK_SPLITTER
+    )
+    if not chunks:
+        raise SystemExit("No documents were loaded. Please check the data folder.")
+
+    # Chunks embedded by a previous index build come from the embedding store
+    embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY),
+        EmbeddingStore(EMBEDDING_CACHE_PATH),
+        model=EMBEDDING_MODEL
+    )
+
+    output_dir = os.path.join(SHARDS_DIR, args.collection)
+    if os.path.exists(output_dir):
+        logger.info(f"Removing existing shards at {output_dir}")
+        shutil.rmtree(output_dir)
+
+    paths = build_shards(chunks, metadatas, embeddings, args.shards, args.strategy, output_dir)
+    logger.info(f"Built {len(paths)} shards for collection '{args.collection}' in {output_dir}")
+    logger.info(embeddings.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import os
+import sys
+import uuid
 import shutil
+import argparse
+import subprocess
 import logging
 from typing import List
 import time
@@ -8,19 +12,27 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 from utils.document_processor import load_and_split_files
+from utils.embedding_store import CachedEmbeddings, EmbeddingStore
+from utils.profiler import RequestProfiler
 from config import (
     GOOGLE_API_KEY,
-    DATA_FOLDER,
-    VECTOR_STORE_PATH,
-    EMBEDDING_MODEL
+    COLLECTIONS,
+    DEFAULT_COLLECTION,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MODEL,
+    CHUNK_SPLITTER,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    PRECOMPUTE_ANSWERS,
+    PROFILE_DIR
 )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def safe_remove_vector_store():
+def safe_remove_vector_store(vector_store_path):
     """Safely remove the vector store directory."""
-    if not os.path.exists(VECTOR_STORE_PATH):
+    if not os.path.exists(vector_store_path):
         logger.info("No existing vector store found.")
         return True
     
@@ -29,7 +41,7 @@ def safe_remove_vector_store():
     while attempt < max_attempts:
         try:
             logger.info(f"Attempting to remove existing vector store (attempt {attempt + 1})")
-            shutil.rmtree(VECTOR_STORE_PATH)
+            shutil.rmtree(vector_store_path)
             logger.info("Successfully removed existing vector store")
             return True
         except PermissionError:
@@ -44,26 +56,40 @@ def safe_remove_vector_store():
             logger.error(f"Error removing vector store: {str(e)}")
             return False
 
-def create_vector_store():
-    """Create a new vector store from documents."""
-    logger.info("Starting vector store creation process")
+def create_vector_store(collection=DEFAULT_COLLECTION):
+    """Create a new vector store for a collection from its documents."""
+    logger.info(f"Starting vector store creation process for collection '{collection}'")
+    if collection not in COLLECTIONS:
+        logger.error(f"Unknown collection '{collection}'. Add it to COLLECTIONS in config.py first.")
+        return False
+    data_folder = COLLECTIONS[collection]["data_folder"]
+    vector_store_path = COLLECTIONS[collection]["vector_store_path"]
     
     # Initialize embedding model
     logger.info("Initializing embedding model...")
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        google_api_key=GOOGLE_API_KEY
+    embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=GOOGLE_API_KEY
+        ),
+        EmbeddingStore(EMBEDDING_CACHE_PATH),
+        model=EMBEDDING_MODEL
     )
     
     # Try to remove existing vector store
-    if not safe_remove_vector_store():
+    if not safe_remove_vector_store(vector_store_path):
         logger.error("Failed to prepare for new vector store creation. Please close any applications using the vector store and try again.")
         return False
     
     try:
         # Load and split documents
-        logger.info(f"Loading documents from {DATA_FOLDER}")
-        chunks, metadatas = load_and_split_files(DATA_FOLDER)
+        logger.info(f"Loading documents from {data_folder}")
+        chunks, metadatas = load_and_split_files(
+            data_folder,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            splitter=CHUNK_SPLITTER
+        )
         
         if not chunks:
             logger.error("No documents were loaded. Please check the data folder.")
@@ -88,7 +114,7 @@ def create_vector_store():
         logger.info("Creating new vector store...")
         try:
             # Ensure the directory exists
-            os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
+            os.makedirs(vector_store_path, exist_ok=True)
             
             # Create the vector store in batches
             batch_size = 50
@@ -101,7 +127,7 @@ def create_vector_store():
                     vector_store = Chroma.from_documents(
                         documents=batch,
                         embedding=embeddings,
-                        persist_directory=VECTOR_STORE_PATH
+                        persist_directory=vector_store_path
                     )
                 else:
                     # Add subsequent batches
@@ -116,7 +142,12 @@ def create_vector_store():
             logger.error("Full error:", exc_info=True)
             return False
         
+        # Lets consumers such as the precomputed answers detect a rebuilt index
+        with open(os.path.join(vector_store_path, "build_id"), "w", encoding="utf-8") as f:
+            f.write(f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
         logger.info("Vector store created and persisted successfully")
+        logger.info(embeddings.report())
         return True
         
     except Exception as e:
@@ -125,8 +156,26 @@ def create_vector_store():
         return False
 
 if __name__ == "__main__":
-    success = create_vector_store()
+    parser = argparse.ArgumentParser(description="Create the vector store from the documents folder")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION, help="Name of the collection to build")
+    parser.add_argument("--profile", action="store_true", help=f"Save a speedscope profile of the run to {PROFILE_DIR}")
+    args = parser.parse_args()
+
+    with RequestProfiler(PROFILE_DIR).maybe_profile("ingest", args.profile):
+        success = create_vector_store(args.collection)
     if success:
         logger.info("Vector store creation completed successfully")
+        # Precomputed answers are only served for the default collection
+        if PRECOMPUTE_ANSWERS and args.collection == DEFAULT_COLLECTION:
+            # Run as a module from the repository root, where the app package imports resolve
+            logger.info("Precomputing answers for canonical questions...")
+            result = subprocess.run(
+                [sys.executable, "-m", "app.precompute_answers"],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            if result.returncode != 0:
+                logger.error(f"Precomputing answers failed with exit code {result.returncode}")
+                sys.exit(result.returncode)
     else:
-        logger.error("Vector store creation failed") 
\ No newline at end of file
+        logger.error("Vector store creation failed")
+        sys.exit(1) 
\ No newline at end of file
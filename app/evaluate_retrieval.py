@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import argparse
+import logging
+import numpy as np
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_community.vectorstores import Chroma
+from app.utils.document_processor import load_and_split_files
+from app.utils.embedding_store import CachedEmbeddings, EmbeddingStore
+from app.utils.offline_embeddings import HashingEmbeddings
+from app.config import (
+    DATA_FOLDER,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_PATH,
+    GOOGLE_API_KEY,
+    CHUNK_RETRIEVAL_K
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GOLDEN_SET_PATH = os.path.join(os.path.dirname(__file__), "evaluation", "golden_questions.json")
+CHARS_PER_TOKEN = 4
+MMR_FETCH_K = 20  # Chroma's default candidate set for max_marginal_relevance_search
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def create_embeddings(kind):
+    """Create the embeddings used for evaluation.
+
+    "hashing" is fully offline; "cached" uses the ingestion embedding store and
+    only calls the API for chunks and questions it has never seen.
+    """
+    if kind == "hashing":
+        return HashingEmbeddings()
+    if kind == "cached":
+        return CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY),
+            EmbeddingStore(EMBEDDING_CACHE_PATH),
+            model=EMBEDDING_MODEL,
+            cache_queries=True
+        )
+    raise ValueError(f"Unknown embeddings: {kind}")
+
+
+def search(vector_store, retriever, query_vector, k):
+    """Run one query through the same Chroma search production would use."""
+    if retriever == "similarity":
+        return vector_store.similarity_search_by_vector(query_vector, k=k)
+    if retriever == "mmr":
+        # Chroma's defaults, except that the candidate set must hold at least k chunks
+        return vector_store.max_marginal_relevance_search_by_vector(
+            query_vector,
+            k=k,
+            fetch_k=max(MMR_FETCH_K, k)
+        )
+    raise ValueError(f"Unknown retriever: {retriever}")
+
+
+def score_question(docs, expected):
+    """Compute recall and reciprocal rank of the expected source files."""
+    retrieved_sources = [doc.metadata["source"] for doc in docs]
+    found = set(retrieved_sources) & set(expected)
+    recall = len(found) / len(expected)
+    reciprocal_rank = 0.0
+    for rank, source in enumerate(retrieved_sources, start=1):
+        if source in expected:
+            reciprocal_rank = 1.0 / rank
+            break
+    return recall, reciprocal_rank
+
+
+def evaluate_chunking(embeddings, golden, query_vectors, splitter, chunk_size, chunk_overlap, retrievers, ks):
+    """Evaluate every retriever and k for one chunking configuration."""
+    chunks, metadatas = load_and_split_files(
+        DATA_FOLDER,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        splitter=splitter
+    )
+    if not chunks:
+        raise RuntimeError(f"No chunks were created from {DATA_FOLDER}")
+
+    # A temporary in-memory collection, searched through the same HNSW index as production
+    vector_store = Chroma.from_texts(
+        chunks,
+        embeddings,
+        metadatas=metadatas,
+        collection_name=f"evaluate_{splitter}_{chunk_size}_{chunk_overlap}"
+    )
+
+    rows = []
+    try:
+        for retriever in retrievers:
+            for k in ks:
+                k = min(k, len(chunks))
+                recalls, reciprocal_ranks, context_chars, latencies = [], [], [], []
+                for item, query_vector in zip(golden, query_vectors):
+                    start = time.perf_counter()
+                    docs = search(vector_store, retriever, query_vector, k)
+                    latencies.append(time.perf_counter() - start)
+
+                    recall, reciprocal_rank = score_question(docs, item["expected_sources"])
+                    recalls.append(recall)
+                    reciprocal_ranks.append(reciprocal_rank)
+                    context_chars.append(sum(len(doc.page_content) for doc in docs))
+
+                rows.append({
+                    "splitter": splitter,
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "chunks": len(chunks),
+                    "retriever": retriever,
+                    "k": k,
+                    "recall": float(np.mean(recalls)),
+                    "mrr": float(np.mean(reciprocal_ranks)),
+                    "context_tokens": int(np.mean(context_chars)) // CHARS_PER_TOKEN,
+                    "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+                    "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+                })
+    finally:
+        vector_store.delete_collection()
+    return rows
+
+
+def print_table(rows):
+    header = f"{'splitter':>9} {'chunk':>6} {'ovl':>4} {'chunks':>6} {'retriever':>10} {'k':>4} {'recall':>7} {'mrr':>6} {'ctx_tok':>8} {'p50_ms':>7} {'p95_ms':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['splitter']:>9} {r['chunk_size']:>6} {r['chunk_overlap']:>4} {r['chunks']:>6} {r['retriever']:>10} {r['k']:>4} "
+            f"{r['recall']:>7.3f} {r['mrr']:>6.3f} {r['context_tokens']:>8} "
+            f"{r['latency_p50_ms']:>7.2f} {r['latency_p95_ms']:>7.2f}"
+        )
+
+
+def recommend(rows, target_recall):
+    """Pick the configuration with the smallest k, then the smallest prompt, that meets the target."""
+    passing = [r for r in rows if r["recall"] >= target_recall]
+    if not passing:
+        return None
+    return min(passing, key=lambda r: (r["k"], r["context_tokens"], r["latency_p50_ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality against latency and prompt size")
+    parser.add_argument("--golden", default=GOLDEN_SET_PATH, help="Golden question set (JSON)")
+    parser.add_argument("--embeddings", choices=["hashing", "cached"], default="hashing")
+    parser.add_argument("--k", type=parse_int_list, default=[5, 10, 20, 50, 100, CHUNK_RETRIEVAL_K])
+    parser.add_argument("--splitters", default="recursive,arabic")
+    parser.add_argument("--chunk-sizes", type=parse_int_list, default=[500, 1000, 1500],
+                        help="Chunk sizes in characters for the recursive splitter")
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--token-budgets", type=parse_int_list, default=[150, 250, 400],
+                        help="Chunk sizes in estimated tokens for the arabic splitter")
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--retrievers", default="similarity,mmr")
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--output", help="Optional path to write all rows as JSON")
+    args = parser.parse_args()
+
+    # Chunking logs every file; keep the report readable
+    logging.getLogger("app.utils.document_processor").setLevel(logging.WARNING)
+
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+    logger.info(f"Loaded {len(golden)} golden questions from {args.golden}")
+
+    embeddings = create_embeddings(args.embeddings)
+    retrievers = [r for r in args.retrievers.split(",") if r]
+    # Embed the questions once so latency covers only the vector store search
+    query_vectors = [embeddings.embed_query(item["question"]) for item in golden]
+
+    rows = []
+    for splitter in [s for s in args.splitters.split(",") if s]:
+        if splitter == "arabic":
+            sizes, overlap = args.token_budgets, args.overlap_tokens
+        else:
+            sizes, overlap = args.chunk_sizes, args.chunk_overlap
+        for chunk_size in sizes:
+            logger.info(f"Evaluating {splitter} splitter, chunk size {chunk_size} (overlap {overlap})")
+            rows.extend(evaluate_chunking(embeddings, golden, query_vectors, splitter, chunk_size, overlap, retrievers, args.k))
+
+    print_table(rows)
+
+    best = recommend(rows, args.target_recall)
+    if best:
+        print(
+            f"\nSmallest configuration with recall >= {args.target_recall}: splitter={best['splitter']}, "
+            f"chunk_size={best['chunk_size']}, "
+            f"retriever={best['retriever']}, k={best['k']} (~{best['context_tokens']} context tokens, "
+            f"recall {best['recall']:.3f}, MRR {best['mrr']:.3f})"
+        )
+    else:
+        print(f"\nNo configuration reached recall {args.target_recall}")
+
+    if isinstance(embeddings, CachedEmbeddings):
+        logger.info(embeddings.report())
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        logger.info(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import logging
+import threading
+from collections import defaultdict
+import httpx
+import uvicorn
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from app import main
+from app.utils.chat_processor import ChatProcessor
+from app.utils.document_processor import load_and_split_files
+from app.utils.offline_embeddings import HashingEmbeddings
+from app.utils.session_store import InMemorySessionStore
+from app.config import DATA_FOLDER, CHUNK_SPLITTER, CHUNK_SIZE, CHUNK_OVERLAP, SESSION_HISTORY_LIMIT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GOLDEN_SET_PATH = os.path.join(os.path.dirname(__file__), "evaluation", "golden_questions.json")
+STUB_ANSWER = "الأمانة قيمة أخلاقية مهمة، وهي أن نحافظ على ما يؤتمن عليه الإنسان ونرده إلى أصحابه. " * 3
+LATENCY_KEYS = ("latency", "ttfb")
+
+
+def parse_mix(value):
+    """Parse an endpoint mix such as "ask=0.5,stream=0.2,search=0.3"."""
+    mix = {}
+    for part in value.split(","):
+        endpoint, weight = part.split("=")
+        mix[endpoint.strip()] = float(weight)
+    return mix
+
+
+def current_rss_mb():
+    """Resident set size of this process, which also hosts the server."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows without psutil
+        return None
+    # ru_maxrss is the peak rather than current size, but better than nothing
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_stub_processor(token_delay):
+    """Create a ChatProcessor backed by local stand-ins for Gemini and the embeddings API."""
+    logging.getLogger("app.utils.document_processor").setLevel(logging.WARNING)
+    chunks, metadatas = load_and_split_files(
+        DATA_FOLDER,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        splitter=CHUNK_SPLITTER
+    )
+    embeddings = HashingEmbeddings()
+    vector_store = Chroma.from_texts(
+        chunks,
+        embeddings,
+        metadatas=metadatas,
+        collection_name="load_test"
+    )
+    logger.info(f"Built in-memory vector store with {len(chunks)} chunks")
+
+    # FakeListChatModel sleeps between streamed characters, standing in for token latency
+    chat_model = FakeListChatModel(responses=[STUB_ANSWER], sleep=token_delay)
+    return ChatProcessor(
+        chat_model=chat_model,
+        embeddings=embeddings,
+        vector_store=vector_store,
+        session_store=InMemorySessionStore(history_limit=SESSION_HISTORY_LIMIT)
+    )
+
+
+def start_server(port):
+    """Run the FastAPI app with uvicorn on a background thread."""
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def send_request(client, endpoint, question, session_id):
+    """Send one request and return its outcome, including time to first byte."""
+    start = time.perf_counter()
+    result = {"endpoint": endpoint, "status": None, "error": None}
+    try:
+        if endpoint == "stream":
+            request = client.build_request("GET", "/stream", params={"question": question, "session_id": session_id})
+        elif endpoint == "ask":
+            request = client.build_request("POST", "/ask", json={"question": question, "session_id": session_id})
+        elif endpoint == "chat":
+            request = client.build_request("POST", "/chat", json={"message": question, "session_id": session_id})
+        elif endpoint == "search":
+            request = client.build_request("POST", "/search", json={"query": question})
+        else:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+
+        response = await client.send(request, stream=True)
+        try:
+            ttfb = None
+            async for _ in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+        finally:
+            await response.aclose()
+        result["status"] = response.status_code
+        result["ttfb"] = ttfb if ttfb is not None else time.perf_counter() - start
+    except Exception as e:
+        result["error"] = type(e).__name__
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+async def probe_event_loop(client, stop, samples):
+    """Time a trivial endpoint periodically; slow replies mean the server's event loop is blocked."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+            samples.append(time.perf_counter() - start)
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+
+
+async def run_load(base_url, rate, duration, mix, sessions, questions, timeout, seed):
+    """Drive open-loop Poisson arrivals: requests are sent on schedule whether or not earlier ones finished."""
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    session_ids = [f"load-{i}" for i in range(sessions)]
+    probe_samples = []
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_event_loop(client, stop, probe_samples))
+
+        tasks = []
+        start = time.perf_counter()
+        next_arrival = start
+        while next_arrival - start < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            tasks.append(asyncio.create_task(
+                send_request(client, endpoint, rng.choice(questions), rng.choice(session_ids))
+            ))
+            next_arrival += rng.expovariate(rate)
+
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    return results, elapsed, probe_samples
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ms = np.array(values) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+    }
+
+
+def summarize(results, elapsed, probe_samples, rss_start, rss_end, settings):
+    """Aggregate raw results into throughput, error rate and latency percentiles."""
+    by_endpoint = defaultdict(list)
+    for r in results:
+        by_endpoint[r["endpoint"]].append(r)
+
+    def group_summary(group):
+        ok = [r for r in group if r["error"] is None and r["status"] is not None and r["status"] < 400]
+        statuses = defaultdict(int)
+        for r in group:
+            statuses[str(r["status"] or r["error"])] += 1
+        return {
+            "requests": len(group),
+            "succeeded": len(ok),
+            "error_rate": 1 - len(ok) / len(group) if group else 0.0,
+            "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+            "statuses": dict(statuses),
+            "latency_ms": percentiles([r["latency"] for r in ok]),
+            "ttfb_ms": percentiles([r["ttfb"] for r in ok]),
+        }
+
+    return {
+        "settings": settings,
+        "elapsed_s": elapsed,
+        "overall": group_summary(results),
+        "endpoints": {endpoint: group_summary(group) for endpoint, group in sorted(by_endpoint.items())},
+        "event_loop_probe_ms": percentiles(probe_samples),
+        "rss_mb": {
+            "start": rss_start,
+            "end": rss_end,
+            "growth": rss_end - rss_start if rss_start is not None and rss_end is not None else None
+        },
+    }
+
+
+def print_report(summary):
+    def fmt(value):
+        return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+    print(f"\nLoad test: {summary['settings']['rate']} req/s for {summary['elapsed_s']:.1f}s")
+    header = f"{'endpoint':>8} {'reqs':>6} {'ok':>6} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'ttfb50':>8} {'ttfb99':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(summary["endpoints"].items()) + [("overall", summary["overall"])]
+    for name, s in rows:
+        print(
+            f"{name:>8} {s['requests']:>6} {s['succeeded']:>6} {s['error_rate'] * 100:>6.1f} {s['throughput_rps']:>7.2f} "
+            f"{fmt(s['latency_ms']['p50'])} {fmt(s['latency_ms']['p95'])} {fmt(s['latency_ms']['p99'])} "
+            f"{fmt(s['ttfb_ms']['p50'])} {fmt(s['ttfb_ms']['p99'])}"
+        )
+    print(f"\nStatus codes: {summary['overall']['statuses']}")
+    probe = summary["event_loop_probe_ms"]
+    print(f"Event loop probe (GET /): p50 {fmt(probe['p50'])} ms, p99 {fmt(probe['p99'])} ms")
+    rss = summary["rss_mb"]
+    if rss["growth"] is not None:
+        print(f"RSS: {rss['start']:.1f} MB -> {rss['end']:.1f} MB ({rss['growth']:+.1f} MB)")
+    else:
+        print("RSS: unavailable (install psutil to measure memory on this platform)")
+
+
+def compare_to_baseline(summary, baseline, tolerance):
+    """Return human readable regressions relative to a saved baseline run."""
+    regressions = []
+
+    def check_latency(label, current, previous):
+        # Ignore sub-5ms differences, which are noise at these scales
+        if current is not None and previous is not None and current > previous * (1 + tolerance) and current - previous > 5:
+            regressions.append(f"{label}: {previous:.1f} ms -> {current:.1f} ms")
+
+    for name in ["overall"] + list(summary["endpoints"]):
+        current = summary["overall"] if name == "overall" else summary["endpoints"][name]
+        previous = baseline["overall"] if name == "overall" else baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        for key in LATENCY_KEYS:
+            for p in ("p95", "p99"):
+                check_latency(f"{name} {key} {p}", current[f"{key}_ms"][p], previous[f"{key}_ms"][p])
+        if current["error_rate"] > previous["error_rate"] + 0.01:
+            regressions.append(f"{name} error rate: {previous['error_rate']:.1%} -> {current['error_rate']:.1%}")
+
+    if summary["overall"]["throughput_rps"] < baseline["overall"]["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"throughput: {baseline['overall']['throughput_rps']:.2f} -> {summary['overall']['throughput_rps']:.2f} req/s"
+        )
+    check_latency("event loop probe p99", summary["event_loop_probe_ms"]["p99"], baseline["event_loop_probe_ms"]["p99"])
+
+    growth, baseline_growth = summary["rss_mb"]["growth"], baseline["rss_mb"]["growth"]
+    if growth is not None and baseline_growth is not None and growth > max(baseline_growth, 1.0) * (1 + tolerance) + 10:
+        regressions.append(f"RSS growth: {baseline['rss_mb']['growth']:.1f} MB -> {summary['rss_mb']['growth']:.1f} MB")
+
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load test of the chat API with local model stand-ins")
+    parser.add_argument("--rate", type=float, default=5.0, help="Mean arrival rate (requests/second)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate arrivals for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("ask=0.4,chat=0.2,stream=0.2,search=0.2"))
+    parser.add_argument("--sessions", type=int, default=20, help="Number of distinct session ids")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Simulated seconds per streamed character")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", help="Write this run's summary to a JSON file")
+    parser.add_argument("--baseline", help="Compare against a saved summary and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    with open(GOLDEN_SET_PATH, encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    main.chat_processor = build_stub_processor(args.token_delay)
+    port = free_port()
+    server, thread = start_server(port)
+    logger.info(f"Server running on port {port}")
+
+    rss_start = current_rss_mb()
+    try:
+        results, elapsed, probe_samples = asyncio.run(run_load(
+            f"http://127.0.0.1:{port}", args.rate, args.duration, args.mix,
+            args.sessions, questions, args.timeout, args.seed
+        ))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    rss_end = current_rss_mb()
+
+    settings = {
+        "rate": args.rate,
+        "duration": args.duration,
+        "mix": args.mix,
+        "sessions": args.sessions,
+        "token_delay": args.token_delay,
+        "seed": args.seed,
+    }
+    summary = summarize(results, elapsed, probe_samples, rss_start, rss_end, settings)
+    print_report(summary)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            logger.warning("Baseline was recorded with different settings; comparison may not be meaningful")
+        regressions = compare_to_baseline(summary, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            raise SystemExit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main_cli()
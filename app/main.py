@@ -1,13 +1,35 @@
 import os
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import List, Optional
-from app.utils.chat_processor import ChatProcessor
-from app.config import DATA_FOLDER
-import time
+from app.utils.chat_processor import ChatProcessor, with_citation
+from app.utils.admission_controller import (
+    AdmissionController,
+    AdmissionRejected,
+    PRIORITY_GENERATION,
+    PRIORITY_RETRIEVAL
+)
+from app.utils.profiler import RequestProfiler
+from app.utils.answer_cache import PrecomputedAnswers, read_build_id
+from app.config import (
+    DATA_FOLDER,
+    VECTOR_STORE_PATH,
+    DEFAULT_COLLECTION,
+    PRECOMPUTED_ANSWERS_PATH,
+    MAX_CONCURRENT_REQUESTS,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    SEARCH_RESULTS_K,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_MAX_FILES,
+    ADMIN_TOKEN
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +37,13 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 chat_processor = None
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_REQUESTS,
+    max_queue=ADMISSION_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT
+)
+precomputed_answers = PrecomputedAnswers(PRECOMPUTED_ANSWERS_PATH)
+profiler = RequestProfiler(PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, max_profiles=PROFILE_MAX_FILES)
 
 # Configure CORS
 app.add_middleware(
@@ -27,14 +56,32 @@ app.add_middleware(
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: str = "default"
+    collection: str = DEFAULT_COLLECTION
 
 class QuestionRequest(BaseModel):
     question: str
+    session_id: str = "default"
+    collection: str = DEFAULT_COLLECTION
+
+class SearchRequest(BaseModel):
+    query: str
+    k: Optional[int] = None
+    collection: str = DEFAULT_COLLECTION
 
 class ChatResponse(BaseModel):
     answer: str
     sources: Optional[List[dict]] = None
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Return a fast 429/503 with Retry-After when the server is saturated."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the chat processor on startup"""
@@ -42,55 +89,160 @@ async def startup_event():
     
     logger.info("Starting FastAPI server...")
     try:
-        chat_processor = ChatProcessor()
+        # A processor may already have been injected, e.g. by the load tester
+        if chat_processor is None:
+            chat_processor = ChatProcessor()
         logger.info("Chat processor initialized successfully")
+        precomputed_answers.load(read_build_id(VECTOR_STORE_PATH))
         logger.info(f"Documents directory: {os.path.abspath(DATA_FOLDER)}")
     except Exception as e:
         logger.error(f"Error initializing chat processor: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop retrieval worker processes and release loaded vector stores"""
+    if chat_processor:
+        await chat_processor.aclose()
+
 @app.get("/")
 async def root():
     return {"message": "Chat API is running"}
 
+def ensure_collection(collection: str):
+    """Reject requests for collections that are not configured."""
+    if not chat_processor.has_collection(collection):
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {collection}")
+
+def is_admin(http_request: Request) -> bool:
+    """Check the admin token header; admin features are disabled when no token is configured."""
+    return bool(ADMIN_TOKEN) and http_request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+def profile_requested(http_request: Request) -> bool:
+    """Profiling on demand needs both the X-Profile header and a valid admin token."""
+    return http_request.headers.get("X-Profile") == "1" and is_admin(http_request)
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, response: Response):
     if not chat_processor:
         raise HTTPException(status_code=500, detail="Chat processor not initialized")
+    ensure_collection(request.collection)
     
-    try:
-        answer, sources = await chat_processor.get_answer(request.message)
-        return ChatResponse(answer=answer, sources=sources)
-    except Exception as e:
-        logger.error(f"Error processing chat request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async with admission.slot(PRIORITY_GENERATION):
+        try:
+            with profiler.maybe_profile("chat", profile_requested(http_request)) as profile_name:
+                answer, sources = await chat_processor.get_answer(
+                    request.message, request.session_id, request.collection
+                )
+            if profile_name:
+                response.headers["X-Profile-Id"] = profile_name
+            return ChatResponse(answer=answer, sources=sources)
+        except Exception as e:
+            logger.error(f"Error processing chat request: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ask")
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, http_request: Request, response: Response):
     """Process a question and return an answer."""
     if not chat_processor:
         raise HTTPException(status_code=500, detail="Chat processor not initialized")
+    ensure_collection(request.collection)
+
+    # Canonical questions are answered from the offline table without retrieval or generation
+    precomputed = None
+    if request.collection == DEFAULT_COLLECTION:
+        precomputed = precomputed_answers.lookup(request.question)
+    if precomputed:
+        logger.info(f"Answering from precomputed answers: {request.question}")
+        try:
+            # Session writes can wait on SQLite locks held by other workers
+            await asyncio.to_thread(
+                chat_processor.record_exchange, request.session_id, request.question, precomputed["answer"]
+            )
+        except Exception as e:
+            logger.error(f"Error recording precomputed answer: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        return {
+            "answer": with_citation(precomputed["answer"], precomputed["citation"]),
+            "sources": precomputed["sources"]
+        }
     
-    try:
-        logger.info(f"Received question: {request.question}")
-        answer, sources = await chat_processor.get_answer(request.question)
-        return {"answer": answer, "sources": sources}
-    except Exception as e:
-        logger.error(f"Error processing question: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async with admission.slot(PRIORITY_GENERATION):
+        try:
+            logger.info(f"Received question: {request.question}")
+            with profiler.maybe_profile("ask", profile_requested(http_request)) as profile_name:
+                answer, sources = await chat_processor.get_answer(
+                    request.question, request.session_id, request.collection
+                )
+            if profile_name:
+                response.headers["X-Profile-Id"] = profile_name
+            return {"answer": answer, "sources": sources}
+        except Exception as e:
+            logger.error(f"Error processing question: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """Return the most relevant chunks for a query without generating an answer."""
+    if not chat_processor:
+        raise HTTPException(status_code=500, detail="Chat processor not initialized")
+    ensure_collection(request.collection)
+
+    async with admission.slot(PRIORITY_RETRIEVAL):
+        try:
+            results = await chat_processor.search(
+                request.query, k=request.k or SEARCH_RESULTS_K, collection=request.collection
+            )
+            return {"results": results}
+        except Exception as e:
+            logger.error(f"Error processing search: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics")
+async def metrics():
+    """Expose admission, precomputed answer, language guard and collection counters."""
+    stats = {"admission": admission.stats(), "precomputed_answers": precomputed_answers.stats()}
+    if chat_processor:
+        stats["language_guard"] = chat_processor.language_guard_stats()
+        stats["collections"] = chat_processor.collection_stats()
+    return stats
+
+@app.get("/admin/profiles")
+async def list_profiles(http_request: Request):
+    """List recently captured profiles."""
+    if not is_admin(http_request):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"profiles": profiler.list_profiles()}
+
+@app.get("/admin/profiles/{name}")
+async def download_profile(name: str, http_request: Request):
+    """Download a captured profile in speedscope format."""
+    if not is_admin(http_request):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    path = profiler.profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
+
 @app.get("/check-vector-store")
-async def check_vector_store():
+async def check_vector_store(collection: str = DEFAULT_COLLECTION):
     """Endpoint to check the contents of the vector store"""
     if not chat_processor:
         raise HTTPException(status_code=500, detail="Chat processor not initialized")
+    ensure_collection(collection)
     
     try:
-        # Get the number of documents in the vector store
-        count = chat_processor._vector_store._collection.count()
-        
-        # Get a sample query result
-        test_query = "ما هي القيم الأخلاقية؟"
-        results = chat_processor._vector_store.similarity_search(test_query, k=2)
+        # Hold the store so an eviction cannot release it while it is queried
+        async with chat_processor.use_vector_store(collection) as vector_store:
+            # Get the number of documents in the vector store; sharded retrievers count across their shards
+            if hasattr(vector_store, "count"):
+                count = await asyncio.to_thread(vector_store.count)
+            else:
+                count = await asyncio.to_thread(vector_store._collection.count)
+
+            # Get a sample query result
+            test_query = "ما هي القيم الأخلاقية؟"
+            results = await vector_store.asimilarity_search(test_query, k=2)
         
         sample_docs = []
         for doc in results:
@@ -110,14 +262,33 @@ async def check_vector_store():
         raise HTTPException(status_code=500, detail=str(e)) 
 
 @app.get("/stream")
-async def stream(question: str):
+async def stream(question: str, session_id: str = "default", collection: str = DEFAULT_COLLECTION):
     if not chat_processor:
         raise HTTPException(status_code=500, detail="Chat processor not initialized")
+    ensure_collection(collection)
+
+    # Admit before the response starts so a saturated server can still answer 429/503
+    admitted_at = await admission.acquire(PRIORITY_GENERATION)
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(admitted_at)
 
     async def event_generator():
-        answer, _ = await chat_processor.get_answer(question)
+        try:
+            answer, _ = await chat_processor.get_answer(question, session_id, collection)
+        finally:
+            release_slot()
         for part in answer.split():
             yield f"data: {part}\n\n"
-            time.sleep(0.5)  # Adjust timing as needed
+            await asyncio.sleep(0.5)  # Adjust timing as needed
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
\ No newline at end of file
+    # The background task covers clients that disconnect before the body is iterated
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        background=BackgroundTask(release_slot)
+    )
\ No newline at end of file
@@ -0,0 +1,78 @@
+import os
+import sys
+import asyncio
+import logging
+from app.utils.chat_processor import ChatProcessor
+from app.utils.answer_cache import PrecomputedAnswers, read_build_id
+from app.utils.session_store import InMemorySessionStore
+from app.config import (
+    DATA_FOLDER,
+    VECTOR_STORE_PATH,
+    PRECOMPUTED_ANSWERS_PATH,
+    ANSWER_QUESTION_TEMPLATES
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def find_value_folders(folder_path):
+    """Return (domain, value) pairs for every value folder under the domain folders."""
+    values = []
+    for domain in sorted(os.listdir(folder_path)):
+        domain_path = os.path.join(folder_path, domain)
+        if not os.path.isdir(domain_path):
+            continue
+        for value in sorted(os.listdir(domain_path)):
+            if os.path.isdir(os.path.join(domain_path, value)):
+                values.append((domain, value))
+    return values
+
+
+async def precompute_answers():
+    """Generate answers for every question template and value folder and save the lookup table."""
+    build_id = read_build_id(VECTOR_STORE_PATH)
+    # Each question gets a fresh session so answers do not depend on one another
+    chat_processor = ChatProcessor(session_store=InMemorySessionStore())
+    answers = PrecomputedAnswers(PRECOMPUTED_ANSWERS_PATH)
+
+    values = find_value_folders(DATA_FOLDER)
+    logger.info(f"Precomputing answers for {len(values)} values x {len(ANSWER_QUESTION_TEMPLATES)} templates")
+
+    failed = 0
+    for domain, value in values:
+        for template in ANSWER_QUESTION_TEMPLATES:
+            question = template.format(value=value)
+            try:
+                answer, citation, sources = await chat_processor.generate_answer(
+                    question, session_id=f"precompute:{question}"
+                )
+            except Exception as e:
+                logger.error(f"Error generating answer for '{question}': {str(e)}")
+                failed += 1
+                continue
+
+            # generate_answer returns no citation when it rejected a non-Arabic answer
+            if citation is None or not sources:
+                logger.warning(f"No usable answer for '{question}'")
+                failed += 1
+                continue
+
+            answers.add({
+                "question": question,
+                "value": value,
+                "domain": domain,
+                "answer": answer,
+                "citation": citation,
+                "sources": sources
+            })
+            logger.info(f"Generated answer for '{question}'")
+
+    answers.save(build_id)
+    logger.info(f"Saved {len(answers)} precomputed answers to {PRECOMPUTED_ANSWERS_PATH} ({failed} failed)")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    if not asyncio.run(precompute_answers()):
+        sys.exit(1)
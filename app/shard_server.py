@@ -0,0 +1,90 @@
+import os
+import asyncio
+import argparse
+import logging
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import List
+from app.utils.sharded_retrieval import ShardedRetriever
+from app.config import (
+    DEFAULT_COLLECTION,
+    SHARDS_DIR,
+    WORKERS_PER_SHARD,
+    SHARD_SERVER_HOST,
+    SHARD_SERVER_PORT
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One shard server holds the shards for every API worker, so they are loaded once per host.
+# It runs as a single process; the shard worker processes behind it do the searching.
+app = FastAPI()
+retriever = None
+
+class ShardSearchRequest(BaseModel):
+    vector: List[float]
+    k: int = 4
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the shard worker processes."""
+    if retriever:
+        retriever.close()
+
+@app.get("/")
+async def root():
+    return {"message": "Shard server is running", "shards": len(retriever.shard_paths) if retriever else 0}
+
+@app.post("/search")
+async def search(request: ShardSearchRequest):
+    """Scatter a query vector to every shard and return the merged top k with distances."""
+    if not retriever:
+        raise HTTPException(status_code=500, detail="Shards not loaded")
+
+    try:
+        hits = await retriever.asimilarity_search_by_vector_with_scores(request.vector, request.k)
+        return {
+            "hits": [
+                {"content": doc.page_content, "metadata": doc.metadata, "score": score}
+                for doc, score in hits
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error searching shards: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/count")
+async def count():
+    """Return the number of chunks across all shards."""
+    if not retriever:
+        raise HTTPException(status_code=500, detail="Shards not loaded")
+
+    try:
+        return {"count": await asyncio.to_thread(retriever.count)}
+    except Exception as e:
+        logger.error(f"Error counting shards: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def main():
+    global retriever
+
+    parser = argparse.ArgumentParser(description="Serve a collection's shards to all API workers")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION)
+    parser.add_argument("--shards-dir", help="Directory of shard-* stores; defaults to the collection's shards")
+    parser.add_argument("--host", default=SHARD_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SHARD_SERVER_PORT)
+    parser.add_argument("--workers-per-shard", type=int, default=WORKERS_PER_SHARD)
+    args = parser.parse_args()
+
+    # Queries arrive as vectors, so the shard server needs no embeddings client
+    retriever = ShardedRetriever.from_directory(
+        args.shards_dir or os.path.join(SHARDS_DIR, args.collection),
+        workers_per_shard=args.workers_per_shard
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from app.utils.admission_controller import (
+    AdmissionController,
+    AdmissionRejected,
+    PRIORITY_RETRIEVAL,
+    PRIORITY_GENERATION
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_priority_order():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        order = []
+        holder = await controller.acquire()
+
+        async def request(name, priority):
+            async with controller.slot(priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.create_task(request("generation-1", PRIORITY_GENERATION)),
+            asyncio.create_task(request("retrieval", PRIORITY_RETRIEVAL)),
+            asyncio.create_task(request("generation-2", PRIORITY_GENERATION)),
+        ]
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 3
+
+        controller.release(holder)
+        await asyncio.gather(*tasks)
+        # Retrieval jumps the queue; equal priorities are served in arrival order
+        assert order == ["retrieval", "generation-1", "generation-2"], order
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
+    logger.info("Priority order test passed")
+
+def test_queue_full():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        holder = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        try:
+            await controller.acquire()
+            raise AssertionError("Expected the request to be rejected")
+        except AdmissionRejected as e:
+            assert e.status_code == 429
+            assert e.retry_after >= 1
+
+        controller.release(holder)
+        controller.release(await waiter)
+        stats = controller.stats()
+        assert stats["rejected_queue_full"] == 1
+        assert stats["active"] == 0
+
+    asyncio.run(run())
+    logger.info("Queue full test passed")
+
+def test_queue_deadline():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=0.05)
+        holder = await controller.acquire()
+
+        try:
+            await controller.acquire()
+            raise AssertionError("Expected the request to time out")
+        except AdmissionRejected as e:
+            assert e.status_code == 503
+
+        stats = controller.stats()
+        assert stats["rejected_timeout"] == 1
+        assert stats["queue_depth"] == 0
+
+        # The expired waiter must not swallow the slot when it is released
+        controller.release(holder)
+        assert controller.stats()["active"] == 0
+        controller.release(await controller.acquire())
+
+    asyncio.run(run())
+    logger.info("Queue deadline test passed")
+
+def test_cancellation():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        holder = await controller.acquire()
+
+        # Cancelled while still waiting: leaves the queue without taking a slot
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.stats()["queue_depth"] == 0
+        assert controller.stats()["active"] == 1
+
+        # Cancelled right after release() handed it the slot: depending on the
+        # Python version the waiter either keeps the slot or passes it on
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        controller.release(holder)
+        waiter.cancel()
+        result, = await asyncio.gather(waiter, return_exceptions=True)
+        if not isinstance(result, BaseException):
+            controller.release(result)
+        assert controller.stats()["active"] == 0
+
+        controller.release(await controller.acquire())
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
+    logger.info("Cancellation test passed")
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_queue_full()
+    test_queue_deadline()
+    test_cancellation()
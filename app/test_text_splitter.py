@@ -0,0 +1,63 @@
+import logging
+import random
+from app.utils.document_processor import ArabicTextSplitter, estimate_tokens
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORDS = ["الأمانة", "قيمة", "أخلاقية", "مهمة", "نحافظ", "على", "ما", "يؤتمن", "عليه", "الإنسان", "الصدق", "التعاون"]
+ENDINGS = [".", "؟", "!", "؛", "،", ""]
+
+def random_text(rng):
+    """Build paragraphs of random sentences, some far longer than a chunk."""
+    paragraphs = []
+    for _ in range(rng.randint(0, 8)):
+        sentences = []
+        for _ in range(rng.randint(0, 12)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(1, 80))]
+            sentences.append(" ".join(words) + rng.choice(ENDINGS))
+        paragraphs.append(" ".join(sentences))
+    return "\n".join(paragraphs)
+
+def test_chunks_within_budget():
+    rng = random.Random(0)
+    for _ in range(300):
+        max_tokens = rng.randint(20, 120)
+        splitter = ArabicTextSplitter(max_tokens=max_tokens, overlap_tokens=rng.randint(0, max_tokens - 1))
+        for chunk in splitter.split_text(random_text(rng)):
+            assert estimate_tokens(chunk) <= max_tokens, (estimate_tokens(chunk), max_tokens, chunk)
+    logger.info("Budget test passed")
+
+def test_overlap():
+    sentences = [f"{' '.join(WORDS[i % len(WORDS)] for _ in range(4))} رقم {i}." for i in range(30)]
+    splitter = ArabicTextSplitter(max_tokens=60, overlap_tokens=20)
+    chunks = splitter.split_text(" ".join(sentences))
+
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # The next chunk starts with whole trailing sentences of the previous one, never all of them
+        previous_sentences = [s for s in sentences if s in previous]
+        chunk_sentences = [s for s in sentences if s in chunk]
+        start = previous_sentences.index(chunk_sentences[0])
+        carried = previous_sentences[start:]
+        assert 0 < start and chunk_sentences[:len(carried)] == carried, (previous, chunk)
+        assert estimate_tokens(" ".join(carried)) <= 20
+    # Every sentence appears in some chunk
+    assert all(any(sentence in chunk for chunk in chunks) for sentence in sentences)
+
+    no_overlap = ArabicTextSplitter(max_tokens=60, overlap_tokens=0).split_text(" ".join(sentences))
+    assert sum(len(c) for c in no_overlap) < sum(len(c) for c in chunks)
+    logger.info("Overlap test passed")
+
+def test_empty_input():
+    splitter = ArabicTextSplitter(max_tokens=50, overlap_tokens=10)
+    assert splitter.split_text("") == []
+    assert splitter.split_text("\n \n\n") == []
+    assert splitter.split_paragraphs([]) == []
+    logger.info("Empty input test passed")
+
+if __name__ == "__main__":
+    test_chunks_within_budget()
+    test_overlap()
+    test_empty_input()
@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first when a slot frees up
+PRIORITY_RETRIEVAL = 0
+PRIORITY_GENERATION = 1
+
+_PRIORITY_NAMES = {
+    PRIORITY_RETRIEVAL: "retrieval",
+    PRIORITY_GENERATION: "generation",
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or queue deadline exceeded)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        """Limit concurrent LLM-bound work with a bounded, prioritised wait queue."""
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_timeout = 0
+        self._wait_times = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+
+    async def acquire(self, priority: int = PRIORITY_GENERATION, timeout: Optional[float] = None) -> float:
+        """Wait for a slot and return the monotonic time at which the request was admitted."""
+        enqueued_at = time.monotonic()
+
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return self._record_admission(enqueued_at)
+
+        if len(self._waiters) >= self.max_queue:
+            self._rejected_queue_full += 1
+            logger.warning(f"Admission queue full ({len(self._waiters)} waiting), rejecting request")
+            raise AdmissionRejected(429, "Server is busy, please retry later", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await asyncio.wait_for(future, timeout if timeout is not None else self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove_waiter(entry)
+            # wait_for can time out after release() already handed us the slot
+            if future.done() and not future.cancelled():
+                self._hand_over_slot()
+            self._rejected_timeout += 1
+            logger.warning(f"Request waited {time.monotonic() - enqueued_at:.2f}s in admission queue, giving up")
+            raise AdmissionRejected(503, "Timed out waiting for capacity, please retry later", self._retry_after())
+        except BaseException:
+            self._remove_waiter(entry)
+            # The slot may have been handed over just before we were cancelled
+            if future.done() and not future.cancelled():
+                self._hand_over_slot()
+            raise
+
+        # The slot was transferred by release(), so _active already counts us
+        return self._record_admission(enqueued_at)
+
+    def release(self, admitted_at: Optional[float] = None):
+        """Release a slot, handing it directly to the highest priority waiter if any."""
+        if admitted_at is not None:
+            self._service_times.append(time.monotonic() - admitted_at)
+        self._hand_over_slot()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_GENERATION, timeout: Optional[float] = None):
+        """Async context manager holding a slot for the duration of the block."""
+        admitted_at = await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        """Return queue depth, wait time and rejection counters."""
+        wait_times = sorted(self._wait_times)
+        queued_by_priority = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for priority, _, _ in self._waiters:
+            name = _PRIORITY_NAMES.get(priority, str(priority))
+            queued_by_priority[name] = queued_by_priority.get(name, 0) + 1
+
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "queue_depth_by_priority": queued_by_priority,
+            "admitted": self._admitted,
+            "rejected_queue_full": self._rejected_queue_full,
+            "rejected_timeout": self._rejected_timeout,
+            "wait_time_avg": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            "wait_time_p95": wait_times[int(0.95 * (len(wait_times) - 1))] if wait_times else 0.0,
+            "wait_time_max": wait_times[-1] if wait_times else 0.0,
+            "service_time_avg": self._avg_service_time(),
+        }
+
+    def _record_admission(self, enqueued_at: float) -> float:
+        admitted_at = time.monotonic()
+        self._admitted += 1
+        self._wait_times.append(admitted_at - enqueued_at)
+        return admitted_at
+
+    def _hand_over_slot(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def _remove_waiter(self, entry):
+        try:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        except ValueError:
+            pass
+
+    def _avg_service_time(self) -> float:
+        if not self._service_times:
+            return 0.0
+        return sum(self._service_times) / len(self._service_times)
+
+    def _retry_after(self) -> int:
+        """Estimate how many seconds until the current backlog drains."""
+        service_time = self._avg_service_time() or 1.0
+        backlog = len(self._waiters) + self._active
+        return max(1, math.ceil(service_time * backlog / max(1, self.max_concurrent)))
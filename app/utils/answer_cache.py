@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import logging
+from typing import Optional
+from .document_processor import normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for lookup: Arabic letter forms, tatweel, punctuation and spacing."""
+    text = normalize_arabic(question)
+    text = text.replace("\u0640", "")  # Remove tatweel
+    text = re.sub(r"[^\w\s]", " ", text)  # Remove punctuation, including ؟ and ،
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def read_build_id(vector_store_path: str) -> Optional[str]:
+    """Return the id written by the last index build, if any."""
+    path = os.path.join(vector_store_path, "build_id")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+class PrecomputedAnswers:
+    def __init__(self, path: str):
+        """Lookup table of answers generated offline for canonical questions."""
+        self.path = path
+        self.build_id = None
+        self._exact = {}
+        self._normalized = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, expected_build_id: Optional[str] = None) -> int:
+        """Load the table, ignoring it if it was generated against a different index build."""
+        if not os.path.exists(self.path):
+            logger.info(f"No precomputed answers found at {self.path}")
+            return 0
+
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("build_id") != expected_build_id:
+            logger.warning(
+                f"Precomputed answers were generated for index build {data.get('build_id')}, "
+                f"current build is {expected_build_id}; ignoring them"
+            )
+            return 0
+
+        self.build_id = data.get("build_id")
+        self._exact = {}
+        self._normalized = {}
+        for entry in data.get("answers", []):
+            # Tables written before answers and citations were stored separately
+            if "citation" not in entry:
+                logger.warning(f"Precomputed answer without a citation, ignoring it: {entry.get('question')}")
+                continue
+            self.add(entry)
+        logger.info(f"Loaded {len(self._exact)} precomputed answers")
+        return len(self._exact)
+
+    def add(self, entry: dict):
+        self._exact[entry["question"]] = entry
+        self._normalized[normalize_question(entry["question"])] = entry
+
+    def lookup(self, question: str) -> Optional[dict]:
+        """Return the precomputed entry for a question by exact, then normalized, match."""
+        entry = self._exact.get(question) or self._normalized.get(normalize_question(question))
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def save(self, build_id: Optional[str] = None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"build_id": build_id, "answers": list(self._exact.values())}
+        # Write then rename so running servers never read a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._exact), "hits": self.hits, "misses": self.misses}
@@ -4,52 +4,95 @@ from langchain.vectorstores import Chroma
 from langchain.chains import ConversationChain
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
 from langchain.schema import HumanMessage
-from langchain_core.runnables import RunnableWithMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 import logging
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 from datetime import datetime
-import os
+from .session_store import create_session_store
+from .language_guard import LanguageGuardMetrics, contains_arabic
+from .collection_manager import CollectionManager
+from .sharded_retrieval import ShardClient
+from .profiler import is_profiling, run_blocking
 from ..config import (
     GOOGLE_API_KEY, 
     EMBEDDING_MODEL, 
     CHAT_MODEL, 
     CHUNK_RETRIEVAL_K,
-    VECTOR_STORE_PATH
+    SEARCH_RESULTS_K,
+    COLLECTIONS,
+    DEFAULT_COLLECTION,
+    COLLECTION_MEMORY_BUDGET_MB,
+    SHARDED_RETRIEVAL,
+    SHARD_SERVER_URL,
+    SHARD_SERVER_TIMEOUT,
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_HISTORY_LIMIT,
+    SESSION_MAX_STORED_MESSAGES,
+    SESSION_RETENTION_DAYS,
+    LANGUAGE_GUARD_CHARS
 )
 
 logger = logging.getLogger(__name__)
 
-class CustomMemory:
-    def __init__(self):
-        """Initialize custom memory to store conversation history."""
-        self.history = []
+STRICT_ARABIC_INSTRUCTION = "\nتنبيه: اكتب الإجابة كاملة باللغة العربية الفصحى فقط، ولا تستخدم أي لغة أخرى."
 
-    async def aget_messages(self) -> List[dict]:
-        """Asynchronously return all messages stored in memory."""
-        return [{"role": "user", "content": msg} for msg in self.history]
+def format_history(messages: List[BaseMessage]) -> str:
+    """Render stored conversation messages as plain text for the prompt."""
+    lines = []
+    for message in messages:
+        prefix = "Q" if message.type == "human" else "A"
+        lines.append(f"{prefix}: {message.content}")
+    return "\n".join(lines)
 
-    async def aadd_message(self, message: str):
-        """Asynchronously add a message to the history."""
-        self.history.append(message)
+
+def with_citation(answer: str, citation: str) -> str:
+    """Append the source citation shown to the user after an answer."""
+    return f"{answer}\n\n---\n\n{citation}"
 
 
 class ChatProcessor:
-    def __init__(self):
-        """Initialize the chat processor with necessary components."""
+    def __init__(self, chat_model=None, embeddings=None, vector_store=None, session_store=None):
+        """Initialize the chat processor with necessary components.
+
+        Any component that is not passed in is created from the configuration;
+        passing local stand-ins lets tools run the app without network access.
+        """
         logger.info("Initializing ChatProcessor...")
 
         # Initialize the chat model
-        self._chat_model = ChatGoogleGenerativeAI(
+        self._chat_model = chat_model or ChatGoogleGenerativeAI(
             model="gemini-1.5-flash",
             google_api_key=GOOGLE_API_KEY,
             convert_system_message_to_human=True,
             temperature=0.7
         )
 
+        self._language_guard = LanguageGuardMetrics()
+
         # Initialize vector store and embeddings
-        self._initialize_embeddings()
-        self.initialize_vector_store()
+        if embeddings is not None:
+            self._embeddings = embeddings
+        else:
+            self._initialize_embeddings()
+        # Vector stores are loaded per collection on demand and share the embeddings client
+        self._collections = CollectionManager(
+            self._embeddings,
+            COLLECTIONS,
+            COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024
+        )
+        if vector_store is not None:
+            self._collections.add(DEFAULT_COLLECTION, vector_store)
+        elif SHARDED_RETRIEVAL:
+            # Every API worker connects to the same shard server instead of loading the shards itself
+            logger.info(f"Connecting to shard server at {SHARD_SERVER_URL}...")
+            shard_client = ShardClient(SHARD_SERVER_URL, self._embeddings, timeout=SHARD_SERVER_TIMEOUT)
+            logger.info(f"Shard server is serving {shard_client.count()} chunks")
+            self._collections.add(DEFAULT_COLLECTION, shard_client)
+        else:
+            self.initialize_vector_store()
 
         # Create conversation template
         template = """أنت مساعد ذكي. أجب بإيجاز ووضوح.
@@ -62,7 +105,7 @@ class ChatProcessor:
 
 السؤال الحالي: {input}
 
-تعليمات مهمة:
+تعليمات مهمة:{language_instruction}
 ١. استخدم المعلومات من المحادثات السابقة إذا كانت ذات صلة
 ٢. استخدم المعلومات من قاعدة المعرفة
 ٣. اربط بين المعلومات من المصدرين
@@ -72,51 +115,84 @@ class ChatProcessor:
 الإجابة:"""
 
         prompt = PromptTemplate(
-            input_variables=["history", "input", "context"],
+            input_variables=["history", "input", "context", "language_instruction"],
             template=template
         )
 
-        # Create the chain
-        chain = prompt | self._chat_model | StrOutputParser()
-
-        # Initialize custom memory
-        self._memory = CustomMemory()
+        # Create the chain, rendering the injected history messages as text
+        chain = (
+            RunnablePassthrough.assign(history=lambda x: format_history(x["history"]))
+            | prompt
+            | self._chat_model
+            | StrOutputParser()
+        )
 
-        # Add message history
-        self._conversation_chain = RunnableWithMessageHistory(
-            chain,
-            lambda session_id: self._memory,
-            input_messages_key="input",
-            history_messages_key="history",
+        # Conversation state lives outside the process so any worker can serve a session
+        self._session_store = session_store or create_session_store(
+            SESSION_BACKEND,
+            SESSION_DB_PATH,
+            history_limit=SESSION_HISTORY_LIMIT,
+            max_stored_messages=SESSION_MAX_STORED_MESSAGES,
+            retention_days=SESSION_RETENTION_DAYS
         )
 
-    async def get_answer(self, question: str) -> Tuple[str, List[dict]]:
+        # History is loaded and saved explicitly, so a rejected answer never reaches the session
+        self._conversation_chain = chain
+
+    async def get_answer(
+        self,
+        question: str,
+        session_id: str = "default",
+        collection: str = DEFAULT_COLLECTION
+    ) -> Tuple[str, List[dict]]:
         """Get an answer for the given question using the conversation chain and vector store context."""
+        answer, citation, sources = await self.generate_answer(question, session_id, collection)
+        if citation is None:
+            return answer, sources
+        return with_citation(answer, citation), sources
+
+    async def generate_answer(
+        self,
+        question: str,
+        session_id: str = "default",
+        collection: str = DEFAULT_COLLECTION
+    ) -> Tuple[str, Optional[str], List[dict]]:
+        """Generate an answer and return it without the citation, the citation and the sources.
+
+        The citation is None when no Arabic answer could be generated; the
+        answer is then an apology that is not added to the session history.
+        """
         try:
-            # Retrieve relevant documents from the vector store
-            docs = self._vector_store.similarity_search(question, k=185)
+            # Retrieve relevant documents from the collection's vector store
+            async with self._collections.use(collection) as vector_store:
+                docs = await self._similarity_search(vector_store, question, k=185)
             docs_context = "\n\n".join([doc.page_content for doc in docs])
 
-            # Retrieve the conversation history
-            history = "\n".join([msg['content'] for msg in await self._memory.aget_messages()])
-
-            # Prepare the input context for the conversation
+            # Prepare the input context for the conversation, with the session's
+            # recent history from the session store
             context_input = {
                 "input": question,
+                "history": await run_blocking(self.load_history, session_id),
                 "context": docs_context,
-                "history": history
+                "language_instruction": ""
             }
 
-            # Generate response using the conversation chain
-            response = await self._conversation_chain.ainvoke(
-                context_input,
-                config={"configurable": {"session_id": "default"}}
-            )
+            # Generate response using the conversation chain, retrying once with a
+            # stronger instruction if the answer is not in Arabic
+            response = await self._generate_arabic(context_input)
+            retried = response is None
+            if retried:
+                logger.warning("Answer was not in Arabic, retrying with a stronger instruction")
+                context_input["language_instruction"] = STRICT_ARABIC_INSTRUCTION
+                response = await self._generate_arabic(context_input)
+                if response is None:
+                    self._language_guard.record_retry_failed()
+                    return f"عذراً، يجب أن تكون الإجابة باللغة العربية. الرجاء إعادة السؤال.", None, []
             answer = response.strip()
+            self._language_guard.record_completion(len(answer), retried=retried)
 
-            # Verify Arabic response
-            if not any('\u0600' <= c <= '\u06FF' for c in answer):
-                return f"عذراً، يجب أن تكون الإجابة باللغة العربية. الرجاء إعادة السؤال.", []
+            # Only accepted answers are added to the session history
+            await run_blocking(self.record_exchange, session_id, question, answer)
 
             # Add citation for the most relevant document
             most_relevant_doc = docs[0] if docs else None
@@ -128,12 +204,7 @@ class ChatProcessor:
             else:
                 citation = "Source: Unknown\nLink: No link available"
 
-            answer_with_citation = f"{answer}\n\n---\n\n{citation}"
-
-            # Update history
-            await self._memory.aadd_message(f"Q: {question}\nA: {answer_with_citation}")
-
-            # Return the answer with citation and the sources
+            # Return the answer, its citation and the sources
             sources = [
                 {
                     "source": source,
@@ -142,12 +213,90 @@ class ChatProcessor:
                 }
             ] if most_relevant_doc else []
 
-            return answer_with_citation, sources
+            return answer, citation, sources
 
         except Exception as e:
             logger.error(f"Error getting answer: {str(e)}")
             raise
 
+    async def _similarity_search(self, vector_store, query: str, k: int):
+        # While profiling, search on the profiled task so the profile shows the time spent
+        # inside Chroma; the shard client's time is spent in the shard server instead
+        if is_profiling() and not isinstance(vector_store, ShardClient):
+            return vector_store.similarity_search(query, k=k)
+        return await vector_store.asimilarity_search(query, k=k)
+
+    async def _generate_arabic(self, context_input: dict) -> Optional[str]:
+        """Stream an answer, cancelling it if the first characters contain no Arabic.
+
+        Returns None when the generation was cancelled or finished without any Arabic.
+        """
+        parts = []
+        generated_chars = 0
+        language_checked = False
+        stream = self._conversation_chain.astream(context_input)
+        try:
+            async for chunk in stream:
+                parts.append(chunk)
+                generated_chars += len(chunk)
+                if language_checked:
+                    continue
+                text = "".join(parts)
+                if contains_arabic(text):
+                    language_checked = True
+                elif generated_chars >= LANGUAGE_GUARD_CHARS:
+                    # Closing the stream cancels the rest of the generation
+                    self._language_guard.record_abort(generated_chars)
+                    return None
+        finally:
+            await stream.aclose()
+        if not language_checked:
+            # Shorter than the guard window and still not Arabic
+            self._language_guard.record_rejected()
+            return None
+        return "".join(parts)
+
+    def load_history(self, session_id: str) -> List[BaseMessage]:
+        """Return the recent messages of a session for the prompt."""
+        return self._session_store.get_session_history(session_id).messages
+
+    def record_exchange(self, session_id: str, question: str, answer: str):
+        """Add a question and an answer produced outside the chain to the session history."""
+        self._session_store.get_session_history(session_id).add_messages([
+            HumanMessage(content=question),
+            AIMessage(content=answer)
+        ])
+
+    def use_vector_store(self, collection: str = DEFAULT_COLLECTION):
+        """Async context manager holding a collection's vector store, loading it if needed."""
+        return self._collections.use(collection)
+
+    async def aclose(self):
+        """Release loaded vector stores and shard server connections."""
+        await self._collections.aclose()
+
+    def has_collection(self, collection: str) -> bool:
+        return self._collections.exists(collection)
+
+    def collection_stats(self) -> dict:
+        return self._collections.stats()
+
+    def language_guard_stats(self) -> dict:
+        """Return counters for answers aborted by the Arabic language guard."""
+        return self._language_guard.stats()
+
+    async def search(self, query: str, k: int = SEARCH_RESULTS_K, collection: str = DEFAULT_COLLECTION) -> List[dict]:
+        """Return the most relevant chunks for a query without generating an answer."""
+        async with self._collections.use(collection) as vector_store:
+            docs = await vector_store.asimilarity_search(query, k=k)
+        return [
+            {
+                "content": doc.page_content,
+                "metadata": doc.metadata
+            }
+            for doc in docs
+        ]
+
     def _initialize_embeddings(self):
         """Initialize the embedding model."""
         logger.info("Initializing embedding model...")
@@ -160,20 +309,12 @@ class ChatProcessor:
         logger.info(f"Embedding test successful. Vector dimension: {len(test_embedding)}")
 
     def initialize_vector_store(self):
-        """Load the existing vector store from disk."""
+        """Load the default collection's vector store from disk."""
         logger.info("Starting vector store initialization...")
-        logger.info(f"Loading vector store from: {VECTOR_STORE_PATH}")
-
-        if not os.path.exists(VECTOR_STORE_PATH):
-            logger.error(f"Vector store not found at {VECTOR_STORE_PATH}")
-            raise FileNotFoundError(f"Vector store not found at {VECTOR_STORE_PATH}")
 
         try:
             logger.info("Loading Chroma vector store...")
-            self._vector_store = Chroma(
-                persist_directory=VECTOR_STORE_PATH,
-                embedding_function=self._embeddings
-            )
+            self._collections.get(DEFAULT_COLLECTION)
             logger.info("Chroma initialization successful")
         except Exception as e:
             logger.error(f"Error loading vector store: {str(e)}")
@@ -0,0 +1,233 @@
+import os
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+from langchain_community.vectorstores import Chroma
+
+logger = logging.getLogger(__name__)
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def release_chroma(vector_store) -> bool:
+    """Stop the chromadb system behind a store so its memory can be reclaimed.
+
+    chromadb caches one system per persist directory at class level, so
+    dropping our reference alone would keep the index loaded. It has no public
+    API to release a single system, so this uses the private cache, which is
+    spelled _identifer_to_system before 0.5 and _identifier_to_system since.
+    Returns whether a system was actually stopped.
+    """
+    client = getattr(vector_store, "_client", None)
+    identifier = getattr(client, "_identifier", None)
+    systems = getattr(type(client), "_identifier_to_system", None)
+    if systems is None:
+        systems = getattr(type(client), "_identifer_to_system", None)
+    if identifier is None or systems is None:
+        logger.warning("Cannot release vector store: unsupported chromadb version")
+        return False
+    if identifier not in systems:
+        return False
+    try:
+        systems.pop(identifier).stop()
+        return True
+    except Exception as e:
+        logger.warning(f"Could not release vector store: {str(e)}")
+        return False
+
+
+class CollectionManager:
+    def __init__(self, embeddings, collections: Dict[str, dict], memory_budget_bytes: int):
+        """Load named vector stores on demand and keep the most recently used within a memory budget.
+
+        Memory use of a store is estimated from the size of its persist
+        directory. All stores share the same embeddings client.
+        """
+        self._embeddings = embeddings
+        self._collections = collections
+        self.memory_budget_bytes = memory_budget_bytes
+        self._loaded = OrderedDict()  # name -> (vector store, estimated bytes)
+        self._evicted = {}  # name -> (vector store, estimated bytes) still used by in-flight requests
+        self._in_use = {}  # name -> number of requests using the store
+        self._releasing = set()  # names whose chromadb system is being stopped
+        self._load_locks = {}  # name -> lock serializing loads of that collection
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self.loads = 0
+        self.evictions = 0
+        self.release_failures = 0
+
+    def exists(self, name: str) -> bool:
+        return name in self._collections or name in self._pinned
+
+    def names(self) -> List[str]:
+        return sorted(set(self._collections) | self._pinned)
+
+    def add(self, name: str, vector_store):
+        """Register an already constructed store that is never evicted."""
+        with self._lock:
+            self._loaded[name] = (vector_store, 0)
+            self._pinned.add(name)
+
+    def get(self, name: str):
+        """Return the vector store of a collection, loading it and evicting others if needed.
+
+        This blocks while a store is loaded or released, so it is meant for
+        startup; requests should hold the store with use() instead.
+        """
+        return self._acquire(name, hold=False)
+
+    @asynccontextmanager
+    async def use(self, name: str):
+        """Hold a collection's vector store for a request; eviction waits until it is returned.
+
+        Loading a cold collection and releasing evicted ones run in a worker
+        thread, so they do not stall the event loop.
+        """
+        vector_store = self._acquire(name, hold=True, load=False)
+        while vector_store is None:
+            # Take the hold back on the event loop, so a cancelled request cannot leak one
+            await asyncio.to_thread(self._acquire, name, False)
+            vector_store = self._acquire(name, hold=True, load=False)
+        try:
+            yield vector_store
+        finally:
+            evicted = None
+            with self._lock:
+                self._in_use[name] -= 1
+                if not self._in_use[name]:
+                    del self._in_use[name]
+                    evicted = self._evicted.pop(name, None)
+                    if evicted:
+                        self._releasing.add(name)
+            if evicted:
+                await asyncio.to_thread(self._release, name, evicted[0])
+
+    async def aclose(self):
+        """Release every loaded store, including the connections of shard clients."""
+        with self._lock:
+            vector_stores = [store for store, _ in list(self._loaded.values()) + list(self._evicted.values())]
+            self._loaded.clear()
+            self._evicted.clear()
+            self._pinned.clear()
+        for vector_store in vector_stores:
+            if hasattr(vector_store, "aclose"):
+                await vector_store.aclose()
+            else:
+                await asyncio.to_thread(release_chroma, vector_store)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": list(self._loaded),
+            "pending_release": list(self._evicted),
+            "estimated_bytes": self._used_bytes(),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "release_failures": self.release_failures,
+        }
+
+    def _acquire(self, name: str, hold: bool, load: bool = True):
+        with self._lock:
+            vector_store = self._lookup(name, hold)
+            if vector_store is not None or not load:
+                return vector_store
+            if name not in self._collections:
+                raise KeyError(f"Unknown collection: {name}")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Another thread may have loaded it while we waited, or may still be stopping its old system
+                vector_store = self._lookup(name, hold)
+                if vector_store is not None:
+                    return vector_store
+                while name in self._releasing:
+                    self._released.wait()
+
+            path = self._collections[name]["vector_store_path"]
+            if not os.path.exists(path):
+                logger.error(f"Vector store not found at {path}")
+                raise FileNotFoundError(f"Vector store not found at {path}")
+
+            size = directory_size(path)
+            with self._lock:
+                to_release = self._evict_for(size)
+            for evicted_name, evicted_store in to_release:
+                self._release(evicted_name, evicted_store)
+
+            logger.info(f"Loading collection '{name}' from {path} (~{size / (1024 * 1024):.1f} MB)")
+            vector_store = Chroma(
+                persist_directory=path,
+                embedding_function=self._embeddings
+            )
+            with self._lock:
+                self._loaded[name] = (vector_store, size)
+                self.loads += 1
+                if hold:
+                    self._in_use[name] = self._in_use.get(name, 0) + 1
+            return vector_store
+
+    def _lookup(self, name: str, hold: bool):
+        # Called with the lock held
+        if name in self._evicted:
+            # Still open for in-flight requests; loading it again would share and then lose its chromadb system
+            self._loaded[name] = self._evicted.pop(name)
+        if name not in self._loaded:
+            return None
+        self._loaded.move_to_end(name)
+        if hold:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        return self._loaded[name][0]
+
+    def _used_bytes(self) -> int:
+        # Stores waiting for in-flight requests still hold their memory
+        return sum(size for _, size in list(self._loaded.values()) + list(self._evicted.values()))
+
+    def _evict_for(self, size: int) -> List[Tuple[str, object]]:
+        """Unload least recently used stores; return those to release now, outside the lock.
+
+        Called with the lock held. A store larger than the whole budget is still loaded alone.
+        """
+        to_release = []
+        for name in list(self._loaded):
+            if self._used_bytes() + size <= self.memory_budget_bytes:
+                break
+            if name in self._pinned:
+                continue
+            vector_store, estimated = self._loaded.pop(name)
+            if self._in_use.get(name):
+                self._evicted[name] = (vector_store, estimated)
+                logger.info(f"Collection '{name}' will be evicted once its in-flight requests finish")
+            else:
+                self._releasing.add(name)
+                to_release.append((name, vector_store))
+        return to_release
+
+    def _release(self, name: str, vector_store):
+        released = release_chroma(vector_store)
+        with self._lock:
+            self._releasing.discard(name)
+            self._released.notify_all()
+            if released:
+                self.evictions += 1
+            else:
+                self.release_failures += 1
+        if released:
+            logger.info(f"Evicted collection '{name}' to stay within the memory budget")
+        else:
+            logger.warning(f"Collection '{name}' was unloaded but its memory could not be released")
@@ -1,5 +1,6 @@
 import os
 import re
+import math
 from docx import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import logging
@@ -14,7 +15,117 @@ def normalize_arabic(text):
     text = re.sub(r"ى", "ي", text)  # Normalize yaa
     return text
 
-def load_and_split_files(folder_path):
+# Sentence ends (including Arabic question mark and semicolon) and Arabic comma clause breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u061F\u061B])\s+")
+CLAUSE_BOUNDARY = re.compile(r"(?<=\u060C)\s+")
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Approximate the model token count of a text from its length."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+class ArabicTextSplitter:
+    def __init__(self, max_tokens=250, overlap_tokens=40, length_function=estimate_tokens):
+        """Pack whole paragraphs and sentences into chunks of at most max_tokens.
+
+        Paragraphs are kept together when they fit in a chunk; otherwise they are
+        split at sentence ends (. ! ? ؟ ؛), then at Arabic commas (،), and only
+        as a last resort between words. Consecutive chunks share up to
+        overlap_tokens worth of whole trailing sentences.
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._length = length_function
+
+    def split_text(self, text):
+        """Split text whose paragraphs are separated by newlines."""
+        return self.split_paragraphs(text.split("\n"))
+
+    def split_paragraphs(self, paragraphs):
+        chunks = []
+        current = []  # (paragraph index, text, tokens)
+        for index, paragraph in enumerate(paragraphs):
+            units = [(index, piece, self._length(piece)) for piece in self._split_paragraph(paragraph)]
+            if not units:
+                continue
+
+            # Start a new chunk rather than cut a paragraph that would fit in one on its own
+            if current and self._fits(units) and not self._fits(current + units):
+                current = self._flush(chunks, current, units)
+
+            for unit in units:
+                if current and not self._fits(current + [unit]):
+                    current = self._flush(chunks, current, [unit])
+                current.append(unit)
+
+        if current:
+            chunks.append(self._join(current))
+        return chunks
+
+    def _split_paragraph(self, paragraph):
+        pieces = []
+        for sentence in SENTENCE_BOUNDARY.split(paragraph.strip()):
+            if self._length(sentence) <= self.max_tokens:
+                pieces.append(sentence)
+                continue
+            for clause in CLAUSE_BOUNDARY.split(sentence):
+                if self._length(clause) <= self.max_tokens:
+                    pieces.append(clause)
+                else:
+                    pieces.extend(self._split_words(clause))
+        return [p.strip() for p in pieces if p.strip()]
+
+    def _split_words(self, text):
+        pieces = []
+        current = []
+        for word in text.split():
+            if current and self._length(" ".join(current + [word])) > self.max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _flush(self, chunks, current, next_units):
+        """Emit the current chunk and return the trailing sentences carried into the next one."""
+        chunks.append(self._join(current))
+        overlap = []
+        # Never carry the whole chunk, and leave room for what comes next
+        for unit in reversed(current[1:]):
+            candidate = [unit] + overlap
+            if self._length(self._join(candidate)) > self.overlap_tokens \
+                    or not self._fits(candidate + next_units):
+                break
+            overlap = candidate
+        return overlap
+
+    def _fits(self, units):
+        # Measure the joined text so the separators count against the budget too
+        return self._length(self._join(units)) <= self.max_tokens
+
+    @staticmethod
+    def _join(units):
+        text = units[0][1]
+        for previous, unit in zip(units, units[1:]):
+            text += ("\n" if unit[0] != previous[0] else " ") + unit[1]
+        return text
+
+def create_text_splitter(splitter="recursive", chunk_size=1000, chunk_overlap=100):
+    """Create a text splitter.
+
+    chunk_size and chunk_overlap are characters for the "recursive" splitter
+    and estimated tokens for the "arabic" splitter.
+    """
+    if splitter == "recursive":
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if splitter == "arabic":
+        return ArabicTextSplitter(max_tokens=chunk_size, overlap_tokens=chunk_overlap)
+    raise ValueError(f"Unknown splitter: {splitter}")
+
+def load_and_split_files(folder_path, chunk_size=1000, chunk_overlap=100, splitter="recursive"):
     """Load and split .docx files into chunks."""
     logger.info(f"Starting document loading from: {folder_path}")
     
@@ -24,7 +135,7 @@ def load_and_split_files(folder_path):
         
     logger.info(f"Directory exists and is accessible")
     
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    text_splitter = create_text_splitter(splitter, chunk_size, chunk_overlap)
     all_chunks = []
     metadatas = []
     total_files = 0
@@ -88,6 +199,12 @@ def load_and_split_files(folder_path):
 
     logger.info(f"Document processing complete. Processed {processed_files}/{total_files} files")
     logger.info(f"Total chunks created: {len(all_chunks)}")
+    if all_chunks:
+        total_tokens = sum(estimate_tokens(chunk) for chunk in all_chunks)
+        logger.info(
+            f"Chunking ({splitter}, size {chunk_size}, overlap {chunk_overlap}): "
+            f"~{total_tokens} tokens, ~{total_tokens // len(all_chunks)} tokens per chunk"
+        )
     
     if not all_chunks:
         logger.warning("No content was extracted from any documents")
@@ -0,0 +1,114 @@
+import os
+import re
+import hashlib
+import logging
+import sqlite3
+from array import array
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences map to the same key."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def embedding_key(text: str, model: str) -> str:
+    """Content address of a chunk: hash of the embedding model plus the normalized text."""
+    payload = f"{model}\0{normalize_chunk_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, db_path: str):
+        """Persistent content-addressed store of embedding vectors."""
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the stored vectors for the keys that are present."""
+        found = {}
+        # Stay well below SQLite's bound parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("d", blob).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors by key, ignoring keys that already exist."""
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, array("d", vector).tobytes()) for key, vector in items.items()]
+        )
+        self._conn.commit()
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, store: EmbeddingStore, model: str, cache_queries: bool = False):
+        """Embeddings wrapper that only sends chunks missing from the store upstream."""
+        self._underlying = underlying
+        self._store = store
+        self._model = model
+        self._cache_queries = cache_queries
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(text, self._model) for text in texts]
+        vectors = self._store.get_many(list(set(keys)))
+
+        # Embed each unseen chunk once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = self._underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self._store.put_many(computed)
+            vectors.update(computed)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self._cache_queries:
+            return self._underlying.embed_query(text)
+
+        # Queries may be embedded differently from documents, so keep them apart
+        key = embedding_key(text, f"{self._model}:query")
+        cached = self._store.get_many([key])
+        if key in cached:
+            return cached[key]
+        vector = self._underlying.embed_query(text)
+        self._store.put_many({key: vector})
+        return vector
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Embedding reuse: {self.hits}/{self.hits + self.misses} chunks from cache "
+            f"({self.reuse_ratio:.1%}), {self.misses} sent to the API"
+        )
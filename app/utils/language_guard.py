@@ -0,0 +1,63 @@
+from collections import deque
+
+
+def contains_arabic(text: str) -> bool:
+    """Check whether the text contains any character from the Arabic block."""
+    return any('\u0600' <= c <= '\u06FF' for c in text)
+
+
+class LanguageGuardMetrics:
+    def __init__(self, chars_per_token: int = 4):
+        """Track how often streamed answers are aborted for not being Arabic.
+
+        Token counts are estimated from character counts, since the exact
+        length the aborted answer would have reached is unknown.
+        """
+        self.chars_per_token = chars_per_token
+        self.generations = 0
+        self.aborts = 0
+        self.rejected = 0
+        self.retries_succeeded = 0
+        self.retries_failed = 0
+        self.chars_generated_before_abort = 0
+        self.chars_saved = 0
+        self._answer_lengths = deque(maxlen=100)
+
+    def record_completion(self, answer_chars: int, retried: bool = False):
+        """Record a generation that ran to completion."""
+        self.generations += 1
+        self._answer_lengths.append(answer_chars)
+        if retried:
+            self.retries_succeeded += 1
+
+    def record_abort(self, generated_chars: int):
+        """Record a generation cancelled after generated_chars characters."""
+        self.generations += 1
+        self.aborts += 1
+        self.chars_generated_before_abort += generated_chars
+        self.chars_saved += max(0, self._expected_answer_chars() - generated_chars)
+
+    def record_rejected(self):
+        """Record a generation that finished without Arabic before the abort threshold."""
+        self.generations += 1
+        self.rejected += 1
+
+    def record_retry_failed(self):
+        self.retries_failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "generations": self.generations,
+            "aborts": self.aborts,
+            "abort_rate": self.aborts / self.generations if self.generations else 0.0,
+            "rejected_short_answers": self.rejected,
+            "retries_succeeded": self.retries_succeeded,
+            "retries_failed": self.retries_failed,
+            "tokens_generated_before_abort": self.chars_generated_before_abort // self.chars_per_token,
+            "estimated_tokens_saved": self.chars_saved // self.chars_per_token,
+        }
+
+    def _expected_answer_chars(self) -> int:
+        if not self._answer_lengths:
+            return 0
+        return sum(self._answer_lengths) // len(self._answer_lengths)
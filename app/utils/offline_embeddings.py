@@ -0,0 +1,34 @@
+import hashlib
+import math
+from typing import List
+from langchain_core.embeddings import Embeddings
+from .document_processor import normalize_arabic
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 1024, ngram: int = 3):
+        """Deterministic character n-gram embeddings that need no network access.
+
+        Lexical rather than semantic, so absolute scores differ from the real
+        model, but rankings are stable across runs and machines.
+        """
+        self.dimensions = dimensions
+        self.ngram = ngram
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in normalize_arabic(text).split():
+            padded = f" {word} "
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                gram = padded[i:i + self.ngram].encode("utf-8")
+                # Python's hash() is salted per process, so use a stable digest
+                bucket = int.from_bytes(hashlib.md5(gram).digest()[:4], "little") % self.dimensions
+                vector[bucket] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
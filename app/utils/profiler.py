@@ -0,0 +1,118 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".speedscope.json"
+
+# Set while the current task is being profiled
+_profiling = contextvars.ContextVar("profiling", default=False)
+
+
+def is_profiling() -> bool:
+    """Whether the current task is being profiled."""
+    return _profiling.get()
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call in a worker thread, or inline while profiling so the profile includes it."""
+    if _profiling.get():
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+class RequestProfiler:
+    def __init__(self, output_dir: str, sample_rate: float = 0.0, max_profiles: int = 50):
+        """Capture pyinstrument profiles of individual runs on demand and keep the most recent ones.
+
+        Profiles are saved in speedscope format and can be opened at
+        https://www.speedscope.app.
+        """
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        # pyinstrument samples one thread, so only one profile runs at a time
+        self._active = threading.Lock()
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """Decide whether to profile a run, either on request or by sampling."""
+        if requested:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def maybe_profile(self, label: str, requested: bool = False):
+        """Return a profiling context if this run is selected, otherwise a no-op context."""
+        if not self.should_profile(requested):
+            return nullcontext(None)
+        return self.profile(label)
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the enclosed block and save it, yielding the profile file name.
+
+        In async code only the current task is sampled: time the task spends
+        awaiting shows up as await time, not as work for other requests.
+        pyinstrument does not follow worker threads, so while profiling,
+        calls made through run_blocking (vector store search, session history)
+        run inline on the profiled task. This blocks the event loop for the
+        duration of a profiled request.
+        """
+        if not self._active.acquire(blocking=False):
+            logger.info(f"Skipping profile of {label}: another profile is running")
+            yield None
+            return
+
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}"
+        profiler = Profiler(async_mode="enabled")
+        token = _profiling.set(True)
+        start = time.perf_counter()
+        try:
+            profiler.start()
+            try:
+                yield name
+            finally:
+                profiler.stop()
+                _profiling.reset(token)
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(os.path.join(self.output_dir, name), "w", encoding="utf-8") as f:
+                f.write(profiler.output(renderer=SpeedscopeRenderer()))
+            logger.info(f"Saved profile {name} ({time.perf_counter() - start:.2f}s wall)")
+            self._prune()
+        finally:
+            self._active.release()
+
+    def list_profiles(self) -> List[dict]:
+        """Return saved profiles, newest first."""
+        if not os.path.exists(self.output_dir):
+            return []
+        profiles = []
+        for name in os.listdir(self.output_dir):
+            if not name.endswith(PROFILE_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(self.output_dir, name))
+            profiles.append({"name": name, "size": stat.st_size, "created": stat.st_mtime})
+        return sorted(profiles, key=lambda p: p["created"], reverse=True)
+
+    def profile_path(self, name: str) -> Optional[str]:
+        """Return the path of a saved profile, or None if the name is not a saved profile."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.output_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def _prune(self):
+        for profile in self.list_profiles()[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(self.output_dir, profile["name"]))
+            except OSError:
+                pass
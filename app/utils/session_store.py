@@ -0,0 +1,202 @@
+import os
+import json
+import sqlite3
+import threading
+import logging
+import time
+from typing import Dict, List, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, message_to_dict
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class InMemorySessionStore:
+    def __init__(self, history_limit: int = 20):
+        """Keep per-session history in process memory. Suitable for a single development worker."""
+        self.history_limit = history_limit
+        self._sessions: Dict[str, InMemoryChatMessageHistory] = {}
+        self._lock = threading.Lock()
+
+    def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
+        """Return the history for a session, creating it if needed."""
+        with self._lock:
+            if session_id not in self._sessions:
+                self._sessions[session_id] = InMemoryChatMessageHistory()
+            return LimitedChatMessageHistory(self._sessions[session_id], self.history_limit)
+
+
+class LimitedChatMessageHistory(BaseChatMessageHistory):
+    def __init__(self, history: BaseChatMessageHistory, history_limit: int):
+        """Expose only the most recent messages of a history, like the SQLite backend does."""
+        self._history = history
+        self.history_limit = history_limit
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        messages = self._history.messages
+        return messages[-self.history_limit:] if self.history_limit else []
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._history.add_messages(messages)
+
+    def clear(self) -> None:
+        self._history.clear()
+
+
+class SQLiteSessionStore:
+    def __init__(
+        self,
+        db_path: str,
+        history_limit: int = 20,
+        max_stored_messages: int = 200,
+        retention_days: float = 30
+    ):
+        """Persist per-session history in a SQLite database in WAL mode.
+
+        WAL lets several uvicorn workers on the same host read concurrently while
+        one writes, so a session can be served by any worker. Writes are batched
+        per turn: the question and answer go in one transaction, which also
+        trims the session to max_stored_messages. Sessions idle for longer than
+        retention_days are deleted at startup and then hourly.
+        """
+        self.db_path = db_path
+        self.history_limit = history_limit
+        self.max_stored_messages = max_stored_messages
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._initialize_schema()
+        self.prune_expired()
+
+    def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
+        """Return a history object bound to the given session."""
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads, and langchain
+        # runs sync history calls in an executor, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _initialize_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created_at)"
+        )
+        logger.info(f"Session store ready at {self.db_path}")
+
+    def load_messages(self, session_id: str) -> List[BaseMessage]:
+        """Load the most recent messages of a session in chronological order."""
+        rows = self._connection().execute(
+            "SELECT message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.history_limit)
+        ).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in reversed(rows)])
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]):
+        """Write all messages of a turn in a single transaction."""
+        if not messages:
+            return
+        now = time.time()
+        rows = [(session_id, json.dumps(message_to_dict(m), ensure_ascii=False), now) for m in messages]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO messages (session_id, message, created_at) VALUES (?, ?, ?)",
+                rows
+            )
+            # Keep only the most recent messages of the session
+            conn.execute(
+                """DELETE FROM messages WHERE session_id = ? AND id <= (
+                    SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )""",
+                (session_id, session_id, self.max_stored_messages)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if now - self._last_prune > PRUNE_INTERVAL_SECONDS:
+            self.prune_expired()
+
+    def prune_expired(self):
+        """Delete the messages of sessions with no activity within the retention period."""
+        now = time.time()
+        self._last_prune = now
+        cutoff = now - self.retention_days * 24 * 3600
+        # Whole sessions are removed, so a long-running session keeps its early turns until it goes idle
+        deleted = self._connection().execute(
+            """DELETE FROM messages WHERE session_id IN (
+                SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?
+            )""",
+            (cutoff,)
+        ).rowcount
+        if deleted:
+            logger.info(f"Deleted {deleted} messages from sessions idle for over {self.retention_days} days")
+
+    def clear_session(self, session_id: str):
+        """Delete all messages of a session."""
+        self._connection().execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    def __init__(self, store: SQLiteSessionStore, session_id: str):
+        """Chat message history for one session, backed by a SQLiteSessionStore."""
+        self._store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._store.load_messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._store.append_messages(self.session_id, messages)
+
+    def clear(self) -> None:
+        self._store.clear_session(self.session_id)
+
+
+def create_session_store(
+    backend: str,
+    db_path: str,
+    history_limit: int = 20,
+    max_stored_messages: int = 200,
+    retention_days: float = 30
+):
+    """Create the session store for the configured backend ("memory" or "sqlite")."""
+    if backend == "memory":
+        logger.info("Using in-memory session store")
+        return InMemorySessionStore(history_limit=history_limit)
+    if backend == "sqlite":
+        logger.info("Using SQLite session store")
+        return SQLiteSessionStore(
+            db_path,
+            history_limit=history_limit,
+            max_stored_messages=max_stored_messages,
+            retention_days=retention_days
+        )
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,156 @@
+import os
+import heapq
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import httpx
+from langchain_core.documents import Document
+from langchain_community.vectorstores import Chroma
+from .collection_manager import release_chroma
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _load_shard
+_shard_store = None
+
+
+def _load_shard(path: str):
+    global _shard_store
+    # Queries arrive as vectors, so workers need no embeddings client
+    _shard_store = Chroma(persist_directory=path)
+
+
+def _count_shard() -> int:
+    return _shard_store._collection.count()
+
+
+def _search_shard(vector: List[float], k: int) -> List[Tuple[str, dict, float]]:
+    results = _shard_store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+    return [(doc.page_content, doc.metadata, score) for doc, score in results]
+
+
+def assign_shard(metadata: dict, shard_count: int, strategy: str, domains: List[str]) -> int:
+    """Pick the shard of a chunk. Both strategies keep all chunks of a file together."""
+    source = metadata["source"]
+    if strategy == "domain":
+        return domains.index(Path(source).parts[0]) % shard_count
+    if strategy == "hash":
+        digest = hashlib.md5(source.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "little") % shard_count
+    raise ValueError(f"Unknown shard strategy: {strategy}")
+
+
+def build_shards(chunks, metadatas, embeddings, shard_count, strategy, output_dir) -> List[str]:
+    """Partition chunks into shards and persist one Chroma store per shard."""
+    domains = sorted({Path(m["source"]).parts[0] for m in metadatas})
+    buckets = [([], []) for _ in range(shard_count)]
+    for chunk, metadata in zip(chunks, metadatas):
+        texts, metas = buckets[assign_shard(metadata, shard_count, strategy, domains)]
+        texts.append(chunk)
+        metas.append(metadata)
+
+    paths = []
+    for i, (texts, metas) in enumerate(buckets):
+        if not texts:
+            logger.warning(f"Shard {i} is empty with the '{strategy}' strategy, skipping it")
+            continue
+        path = os.path.join(output_dir, f"shard-{i}")
+        vector_store = Chroma.from_texts(texts, embeddings, metadatas=metas, persist_directory=path)
+        release_chroma(vector_store)
+        logger.info(f"Built shard {i} with {len(texts)} chunks at {path}")
+        paths.append(path)
+    return paths
+
+
+class ShardedRetriever:
+    def __init__(self, shard_paths: List[str], workers_per_shard: int = 1):
+        """Scatter-gather similarity search over shards served by local worker processes.
+
+        A query vector is sent to every shard and the per-shard top k results
+        are merged by distance. The shard server runs one of these for all
+        API workers, which embed queries themselves.
+        """
+        if not shard_paths:
+            raise ValueError("No shards to serve")
+        self.shard_paths = shard_paths
+        context = multiprocessing.get_context("spawn")
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=workers_per_shard,
+                mp_context=context,
+                initializer=_load_shard,
+                initargs=(path,)
+            )
+            for path in shard_paths
+        ]
+        logger.info(f"Serving {len(shard_paths)} shards with {workers_per_shard} worker(s) each")
+
+    @classmethod
+    def from_directory(cls, shards_dir: str, workers_per_shard: int = 1):
+        """Serve every shard-* store found in a directory."""
+        if not os.path.exists(shards_dir):
+            raise FileNotFoundError(f"Shards not found at {shards_dir}")
+        paths = sorted(
+            os.path.join(shards_dir, name) for name in os.listdir(shards_dir) if name.startswith("shard-")
+        )
+        return cls(paths, workers_per_shard)
+
+    async def asimilarity_search_by_vector_with_scores(self, vector: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, _search_shard, vector, k) for executor in self._executors
+        ))
+        return self._merge_with_scores(results, k)
+
+    def count(self) -> int:
+        """Total number of chunks across all shards."""
+        return sum(executor.submit(_count_shard).result() for executor in self._executors)
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _merge_with_scores(shard_results, k) -> List[Tuple[Document, float]]:
+        # Chroma scores are distances, so smaller is more relevant
+        best = heapq.nsmallest(k, (hit for hits in shard_results for hit in hits), key=lambda hit: hit[2])
+        return [(Document(page_content=content, metadata=metadata), score) for content, metadata, score in best]
+
+
+class ShardClient:
+    def __init__(self, url: str, embeddings, timeout: float = 30.0):
+        """Search through the shard server (app.shard_server) shared by every API worker.
+
+        Shards are loaded once by the shard server rather than by each API
+        worker. Queries are embedded here and sent as vectors, and the client
+        exposes the same async search methods as a vector store. Searches use
+        an async HTTP client; the blocking one only serves count().
+        """
+        self.url = url
+        self._embeddings = embeddings
+        self._client = httpx.Client(base_url=url, timeout=timeout)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        self._async_client = httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits)
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> List[Document]:
+        vector = await self._embeddings.aembed_query(query)
+        return await self.asimilarity_search_by_vector(vector, k)
+
+    async def asimilarity_search_by_vector(self, vector: List[float], k: int = 4) -> List[Document]:
+        response = await self._async_client.post("/search", json={"vector": [float(x) for x in vector], "k": k})
+        response.raise_for_status()
+        return [Document(page_content=hit["content"], metadata=hit["metadata"]) for hit in response.json()["hits"]]
+
+    def count(self) -> int:
+        """Total number of chunks across all shards."""
+        response = self._client.get("/count")
+        response.raise_for_status()
+        return response.json()["count"]
+
+    async def aclose(self):
+        self._client.close()
+        await self._async_client.aclose()